@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.calculate_metrics import detect_crossovers
+
+
+def _reference_signal(close: np.ndarray, short_window: int, long_window: int):
+    # The original pandas implementation of the crossover rule.
+    prices = pd.DataFrame({"close": close})
+    short_ma = prices["close"].rolling(window=short_window).mean()
+    long_ma = prices["close"].rolling(window=long_window).mean()
+    prev_short, prev_long = short_ma.shift(1), long_ma.shift(1)
+    signal = pd.Series(0, index=prices.index)
+    signal[(short_ma > long_ma) & (prev_short <= prev_long)] = 1
+    signal[(short_ma < long_ma) & (prev_short >= prev_long)] = -1
+    return short_ma.to_numpy(), long_ma.to_numpy(), signal.to_numpy()
+
+
+class DetectCrossoversTest(unittest.TestCase):
+    def test_matches_pandas_on_rounded_prices(self):
+        # Two-decimal prices, as yfinance returns them, produce exact MA ties
+        # that drift in a naive running sum would break.
+        rng = np.random.default_rng(0)
+        for _ in range(10):
+            close = np.round(50 + np.cumsum(rng.normal(scale=0.5, size=25_000)), 2)
+            for short_window, long_window in ((9, 21), (5, 20), (20, 50)):
+                expected = _reference_signal(close, short_window, long_window)
+                actual = detect_crossovers(close, short_window, long_window)
+                for exp, act in zip(expected, actual):
+                    np.testing.assert_array_equal(act, exp)
+
+    def test_flat_stretch(self):
+        rng = np.random.default_rng(1)
+        close = np.round(100 + np.cumsum(rng.normal(size=300)), 2)
+        close[80:160] = close[80]
+        expected = _reference_signal(close, 9, 21)[2]
+        np.testing.assert_array_equal(detect_crossovers(close, 9, 21)[2], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 from server import mcp
 from utils.calculate_metrics import (
     backtest_strategy,
+    calculate_all_financial_metrics,
     calculate_financial_metric,
     calculate_growth_rates,
     calculate_technical_indicators,
@@ -98,3 +99,19 @@ def mcp_calculate_financial_metrics(financial_data: dict, indicator: str) -> dic
         Dict with financial metrics name as key and value as value. e.g. {'gross_margin': 0.5}
     """
     return calculate_financial_metric(financial_data, indicator)
+
+
+@mcp.tool()
+def mcp_calculate_all_financial_metrics(financial_data: dict) -> dict:
+    """
+    Calculates all supported financial metrics (see mcp_calculate_financial_metrics)
+    from the provided data in a single call. Prefer this over calling
+    mcp_calculate_financial_metrics once per metric.
+    Args:
+        financial_data: Dict with financial data.
+    Returns:
+        Dict with each metric name as key and its value (None if the inputs are missing
+        or not numeric),
+        e.g. {'gross_margin': 0.5, 'operating_margin': 0.3, ...}
+    """
+    return calculate_all_financial_metrics(financial_data)
@@ -2,6 +2,7 @@ from mcp.server.fastmcp import Image
 
 from server import mcp
 from utils.visualization import (
+    plot_batch,
     plot_comparison_chart,
     plot_financial_metric,
     plot_price_chart,
@@ -15,7 +16,8 @@ def mcp_plot_price_chart(
     chart_type: str = "line",
     title: str = "Price Chart",
     filename: str | None = None,
-) -> Image:
+    return_image: bool = True,
+) -> Image | dict:
     """
     Generates a price chart (line or candlestick) from OHLCV data.
     Args:
@@ -23,10 +25,12 @@ def mcp_plot_price_chart(
         chart_type: 'line' or 'candlestick'.
         title: Chart title.
         filename: Optional filename to save the plot.
+        return_image: Set to false to skip sending the image back and only return
+                      {"file_path": ...} for the chart saved to the data/ directory.
     Returns:
         An Image object (PNG) of the chart. The image is also saved to the data/ directory.
     """
-    return plot_price_chart(prices, chart_type, title, filename)
+    return plot_price_chart(prices, chart_type, title, filename, return_image)
 
 
 @mcp.tool()
@@ -36,7 +40,8 @@ def mcp_plot_financial_metric(
     metric_name: str = "Metric",
     title: str = "Financial Metric",
     filename: str | None = None,
-) -> Image:
+    return_image: bool = True,
+) -> Image | dict:
     """
     Plots a financial metric over time.
     Args:
@@ -45,10 +50,14 @@ def mcp_plot_financial_metric(
         metric_name: Name of the metric.
         title: Chart title.
         filename: Optional filename to save the plot.
+        return_image: Set to false to skip sending the image back and only return
+                      {"file_path": ...} for the chart saved to the data/ directory.
     Returns:
         An Image object (PNG) of the chart. The image is also saved to the data/ directory.
     """
-    return plot_financial_metric(dates, values, metric_name, title, filename)
+    return plot_financial_metric(
+        dates, values, metric_name, title, filename, return_image
+    )
 
 
 @mcp.tool()
@@ -58,7 +67,8 @@ def mcp_plot_comparison_chart(
     title: str = "Comparison Chart",
     filename: str | None = None,
     normalized: bool = False,
-) -> Image:
+    return_image: bool = True,
+) -> Image | dict:
     """
     Plots a comparison chart for multiple tickers or financial metrics over time.
     Args:
@@ -69,10 +79,14 @@ def mcp_plot_comparison_chart(
         normalized: Set to true to rebase all series to 100 at the start date, making
                     tickers with very different price levels (e.g. NVDA vs AMD) directly
                     comparable. The Y-axis will read "Indexed Value (base = 100)".
+        return_image: Set to false to skip sending the image back and only return
+                      {"file_path": ...} for the chart saved to the data/ directory.
     Returns:
         An Image object (PNG) of the chart. The image is also saved to the data/ directory.
     """
-    return plot_comparison_chart(dates, series, title, filename, normalized)
+    return plot_comparison_chart(
+        dates, series, title, filename, normalized, return_image
+    )
 
 
 @mcp.tool()
@@ -81,7 +95,9 @@ def mcp_plot_trading_opportunities(
     short_window: int = 9,
     long_window: int = 21,
     title: str = "Trading Opportunities",
-) -> Image:
+    filename: str | None = None,
+    return_image: bool = True,
+) -> Image | dict:
     """
     Plots price data with trading signals/opportunities.
     Args:
@@ -89,7 +105,31 @@ def mcp_plot_trading_opportunities(
         short_window: Short window for the short moving average. Default is 9.
         long_window: Long window for the long moving average. Default is 21.
         title: Chart title.
+        filename: Optional filename to save the plot.
+        return_image: Set to false to skip sending the image back and only return
+                      {"file_path": ...} for the chart saved to the data/ directory.
     Returns:
         An Image object (PNG) of the chart. The image is also saved to the data/ directory.
     """
-    return plot_trading_opportunities(prices, short_window, long_window, title)
+    return plot_trading_opportunities(
+        prices, short_window, long_window, title, filename, return_image
+    )
+
+
+@mcp.tool()
+def mcp_plot_batch(jobs: list) -> list:
+    """
+    Generates several charts at once, rendering them in parallel worker processes.
+    Args:
+        jobs: List of dicts, one per chart. Each has a 'type' key, one of
+              'price_chart', 'financial_metric', 'comparison_chart' or
+              'trading_opportunities', plus the arguments of the matching
+              mcp_plot_* tool, e.g.
+              {"type": "price_chart", "prices": [...], "chart_type": "candlestick"}.
+              Give jobs of the same type distinct filenames so they do not
+              overwrite each other.
+    Returns:
+        A list with one Image (or {"file_path": ...} when return_image is false)
+        per job, in the same order. The images are also saved to the data/ directory.
+    """
+    return plot_batch(jobs)
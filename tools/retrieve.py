@@ -12,7 +12,9 @@ from utils.retrieve_data import (
 @mcp.tool()
 def retrieve_current_price(ticker: str) -> dict:
     """
-    Retrieves the current price for the given ticker.
+    Retrieves the current price for the given ticker. The currency is USD unless
+    retrieve_ticker_info has already been called for this ticker, so call that first
+    for listings quoted in other currencies.
     Args:
         ticker: The ticker symbol of the stock to retrieve the current price for.
     Returns:
@@ -34,6 +36,9 @@ def retrieve_stock_data(
         interval: Data interval (e.g., '1d', '1h', '5m', etc.)
     Returns:
         Dict mapping ticker to its historical data (as a list of dicts).
+        Bar times are exchange-local wall times without a UTC offset: 'date' like
+        '2024-01-02' for daily and longer intervals, 'datetime' like
+        '2024-01-02 09:30:00' for intraday ones.
     """
     return fetch_stock_data(ticker_list, start_date, end_date, interval)
 
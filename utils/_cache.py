@@ -0,0 +1,44 @@
+"""In-process TTL memoization for the yfinance-backed retrieval functions."""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+
+def ttl_cache(ttl: float, maxsize: int = 1024):
+    """
+    Caches a function's return value per argument tuple for ``ttl`` seconds,
+    evicting the least recently used entry once ``maxsize`` is reached.
+    Exceptions are not cached.
+    """
+
+    def decorator(func):
+        entries = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with lock:
+                entry = entries.get(key)
+                if entry is not None and entry[0] > now:
+                    entries.move_to_end(key)
+                    return entry[1]
+            value = func(*args, **kwargs)
+            with lock:
+                entries[key] = (now + ttl, value)
+                entries.move_to_end(key)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return value
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,57 @@
+"""Optional Numba JIT support.
+
+``njit`` compiles the decorated function with Numba when it is installed.
+Without Numba a kernel is replaced by its ``fallback`` (a vectorized pandas or
+NumPy equivalent) when one is given, and by the plain Python function
+otherwise, so the numeric kernels in ``utils.calculate_metrics`` work either
+way without running their per-element loops uncompiled.
+
+Numba itself is heavy to import, so nothing is imported or compiled until the
+first kernel call. At that point every kernel registered so far is replaced in
+its module's globals by its compiled (or fallback) version, which is also what
+lets jitted kernels call one another by name.
+"""
+
+import functools
+import threading
+
+# (func, njit options, fallback) of the kernels not yet swapped in
+_pending: list[tuple] = []
+_lock = threading.Lock()
+
+
+def _resolve_pending():
+    try:
+        from numba import njit as numba_njit
+    except ImportError:  # pragma: no cover - numba is optional
+        numba_njit = None
+    for func, options, fallback in _pending:
+        if numba_njit is not None:
+            resolved = numba_njit(**options)(func)
+        else:
+            resolved = fallback if fallback is not None else func
+        func.__globals__[func.__name__] = resolved
+    _pending.clear()
+
+
+def _lazy(func, options, fallback):
+    @functools.wraps(func)
+    def wrapper(*args):
+        if _pending:
+            with _lock:
+                if _pending:
+                    _resolve_pending()
+        return func.__globals__[func.__name__](*args)
+
+    _pending.append((func, options, fallback))
+    return wrapper
+
+
+def njit(*args, fallback=None, **kwargs):
+    """
+    Drop-in for ``numba.njit`` that defers Numba until the first call. The extra
+    ``fallback`` keyword names the function to use when Numba is not installed.
+    """
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return _lazy(args[0], {}, fallback)
+    return lambda func: _lazy(func, kwargs, fallback)
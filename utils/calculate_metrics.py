@@ -1,5 +1,12 @@
+import ast
+import functools
+import math
+
+import numpy as np
 import pandas as pd
 
+from utils._njit import njit
+
 
 def calculate_growth_rates(series: list) -> dict:
     """
@@ -9,25 +16,299 @@ def calculate_growth_rates(series: list) -> dict:
     Returns:
         Dict with annualized growth rate and list of period-over-period growth rates.
     """
-    growth_rates = []
     try:
-        for i in range(1, len(series)):
-            prev = series[i - 1]
-            curr = series[i]
-            if prev != 0:
-                growth = (curr - prev) / abs(prev)
-            else:
-                growth = None
-            growth_rates.append(growth)
-        if len(series) > 1 and series[0] != 0:
-            annualized = (series[-1] / series[0]) ** (1 / (len(series) - 1)) - 1
-        else:
-            annualized = None
-    except Exception as e:
+        a = np.asarray(series, dtype=np.float64)
+    except (TypeError, ValueError) as e:
         return {"error": str(e)}
+    if a.ndim != 1:
+        return {"error": "series must be a flat list of numbers"}
+    prev = a[:-1]
+    rates = np.divide(
+        a[1:] - prev, np.abs(prev), out=np.full_like(prev, np.nan), where=prev != 0
+    )
+    # One tolist() to Python floats, then a NaN check on plain floats
+    growth_rates = [None if math.isnan(v) else v for v in rates.tolist()]
+    annualized = None
+    if len(a) > 1 and a[0] != 0:
+        with np.errstate(invalid="ignore"):
+            annualized = float((a[-1] / a[0]) ** (1.0 / (len(a) - 1)) - 1)
+        if math.isnan(annualized):
+            annualized = None
     return {"annualized_growth_rate": annualized, "period_growth_rates": growth_rates}
 
 
+# Smoothing factors for EMA spans 12, 26 and 9, i.e. alpha = 2 / (span + 1).
+_MACD_FAST_ALPHA = 2.0 / 13.0
+_MACD_SLOW_ALPHA = 2.0 / 27.0
+_MACD_SIGNAL_ALPHA = 2.0 / 10.0
+
+
+# Vectorized pandas versions of the top-level kernels below, identical to the
+# original implementations. They stand in for the kernels when Numba is not
+# installed, since the kernels' per-element loops are slow as plain Python.
+def _ema_pandas(x, span):
+    return pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def _rsi_pandas(x, w):
+    delta = pd.Series(x).diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.ewm(alpha=1.0 / w, adjust=False).mean()
+    avg_loss = loss.ewm(alpha=1.0 / w, adjust=False).mean()
+    return (100 - (100 / (1 + avg_gain / avg_loss))).to_numpy()
+
+
+def _macd_pandas(x):
+    closes = pd.Series(x)
+    macd = (
+        closes.ewm(span=12, adjust=False).mean()
+        - closes.ewm(span=26, adjust=False).mean()
+    )
+    signal = macd.ewm(span=9, adjust=False).mean()
+    return macd.to_numpy(), signal.to_numpy()
+
+
+def _rolling_mean_pandas(x, w):
+    return pd.Series(x).rolling(window=w).mean().to_numpy()
+
+
+def _vol_pandas(x, w):
+    return pd.Series(x).pct_change().rolling(window=w).std().to_numpy()
+
+
+@njit(cache=True)
+def _ewm_step(weighted, old_wt, cur, alpha):
+    """One ``adjust=False`` EWM update, mirroring pandas' NaN handling."""
+    if weighted == weighted:
+        old_wt *= 1.0 - alpha
+        if cur == cur:
+            if weighted != cur:
+                weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            old_wt = 1.0
+    elif cur == cur:
+        weighted = cur
+    return weighted, old_wt
+
+
+@njit(cache=True)
+def _ewm_njit(x, alpha):
+    out = np.empty(x.shape[0])
+    weighted = np.nan
+    old_wt = 1.0
+    for i in range(x.shape[0]):
+        weighted, old_wt = _ewm_step(weighted, old_wt, x[i], alpha)
+        out[i] = weighted
+    return out
+
+
+@njit(cache=True, fallback=_ema_pandas)
+def _ema_njit(x, span):
+    return _ewm_njit(x, 2.0 / (span + 1.0))
+
+
+@njit(cache=True, fallback=_rsi_pandas)
+def _rsi_njit(x, w):
+    # Wilder's smoothing of gains and losses, both tracked in the same pass.
+    n = x.shape[0]
+    out = np.empty(n)
+    alpha = 1.0 / w
+    avg_gain = np.nan
+    avg_loss = np.nan
+    gain_wt = 1.0
+    loss_wt = 1.0
+    for i in range(n):
+        delta = x[i] - x[i - 1] if i > 0 else np.nan
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        avg_gain, gain_wt = _ewm_step(avg_gain, gain_wt, gain, alpha)
+        avg_loss, loss_wt = _ewm_step(avg_loss, loss_wt, loss, alpha)
+        if avg_loss != 0:
+            out[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        elif avg_gain > 0:
+            out[i] = 100.0
+        else:
+            out[i] = np.nan
+    return out
+
+
+@njit(cache=True, fallback=_macd_pandas)
+def _macd_fused(x):
+    # EMA(12), EMA(26) and the EMA(9) signal line fused into a single loop: one
+    # sequential read of x, writes only to the macd and signal outputs.
+    n = x.shape[0]
+    macd = np.empty(n)
+    signal = np.empty(n)
+    e12 = np.nan
+    e26 = np.nan
+    sig = np.nan
+    wt12 = 1.0
+    wt26 = 1.0
+    wt_sig = 1.0
+    for i in range(n):
+        e12, wt12 = _ewm_step(e12, wt12, x[i], _MACD_FAST_ALPHA)
+        e26, wt26 = _ewm_step(e26, wt26, x[i], _MACD_SLOW_ALPHA)
+        macd[i] = e12 - e26
+        sig, wt_sig = _ewm_step(sig, wt_sig, macd[i], _MACD_SIGNAL_ALPHA)
+        signal[i] = sig
+    return macd, signal
+
+
+@njit(cache=True, fallback=_vol_pandas)
+def _vol_njit(x, w):
+    # Rolling sample std of pct_change using a sliding-window Welford update.
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    returns = np.full(n, np.nan)
+    nobs = 0
+    mean = 0.0
+    m2 = 0.0
+    # pct_change() forward-fills missing closes first. A zero previous close
+    # gives +/-inf there, which rolling() treats as missing, so such returns are
+    # left as NaN rather than divided.
+    prev = x[0] if n > 0 else np.nan
+    for i in range(1, n):
+        cur = x[i] if x[i] == x[i] else prev
+        if prev == prev and prev != 0:
+            r = cur / prev - 1.0
+            if not math.isinf(r):
+                returns[i] = r
+        prev = cur
+    for i in range(n):
+        r = returns[i]
+        if r == r:
+            nobs += 1
+            d = r - mean
+            mean += d / nobs
+            m2 += d * (r - mean)
+        if i >= w:
+            old = returns[i - w]
+            if old == old:
+                nobs -= 1
+                if nobs == 0:
+                    mean = 0.0
+                    m2 = 0.0
+                else:
+                    d = old - mean
+                    mean -= d / nobs
+                    m2 -= d * (old - mean)
+        if nobs >= w and w > 1:
+            out[i] = math.sqrt(max(m2 / (nobs - 1), 0.0))
+    return out
+
+
+@njit(cache=True, fallback=_rolling_mean_pandas)
+def _rolling_mean_njit(x, w):
+    # Port of pandas' roll_mean: a sliding sum with separate Kahan compensation
+    # for the values added and removed, so crossovers on exactly tied MAs fall
+    # out the same as with pd.Series.rolling(w).mean(). Infinities count as
+    # missing, as in rolling().
+    n = x.shape[0]
+    out = np.empty(n)
+    nobs = 0
+    neg_ct = 0
+    sum_x = 0.0
+    comp_add = 0.0
+    comp_remove = 0.0
+    same_run = 0
+    prev_value = np.nan
+    for i in range(n):
+        if i == 0 or w == 1:
+            # pandas restarts the sums when consecutive windows do not overlap
+            nobs = 0
+            neg_ct = 0
+            sum_x = 0.0
+            comp_add = 0.0
+            comp_remove = 0.0
+            same_run = 0
+            prev_value = x[i] if not math.isinf(x[i]) else np.nan
+        elif i >= w:
+            val = x[i - w]
+            if val == val and not math.isinf(val):
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+                if val < 0 or (val == 0 and math.copysign(1.0, val) < 0):
+                    neg_ct -= 1
+        val = x[i]
+        if val == val and not math.isinf(val):
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if val < 0 or (val == 0 and math.copysign(1.0, val) < 0):
+                neg_ct += 1
+            if val == prev_value:
+                same_run += 1
+            else:
+                same_run = 1
+            prev_value = val
+        if nobs >= w and nobs > 0:
+            result = sum_x / nobs
+            if same_run >= nobs:
+                result = prev_value
+            elif neg_ct == 0 and result < 0:
+                result = 0.0
+            elif neg_ct == nobs and result > 0:
+                result = 0.0
+            out[i] = result
+        else:
+            out[i] = np.nan
+    return out
+
+
+def _constant_windows(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    For each full trailing window, whether all its values are identical. pandas
+    special-cases these windows (zero std), so the cumulative-sum helper does
+    the same rather than return float noise.
+    """
+    idx = np.arange(x.shape[0])
+    same = np.concatenate(([False], x[1:] == x[:-1]))
+    run_start = np.maximum.accumulate(np.where(same, 0, idx))
+    return (idx - run_start + 1)[window - 1 :] >= window
+
+
+def _rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing rolling mean with the same values as
+    ``pd.Series.rolling(window).mean()`` (NaN until a full window of valid values).
+    """
+    if window < 1:
+        raise ValueError("window must be a positive integer")
+    if window > x.shape[0]:
+        return np.full(x.shape[0], np.nan)
+    return _rolling_mean_njit(x, window)
+
+
+def _rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing rolling sample std (ddof=1) from cumulative sums of x and x**2,
+    aligned like ``pd.Series.rolling(window).std()``.
+    """
+    out = np.full(x.shape[0], np.nan)
+    if window < 1:
+        raise ValueError("window must be a positive integer")
+    if window == 1 or window > x.shape[0]:
+        return out
+    valid = ~np.isnan(x)
+    # Centre on the first valid value so the sum of squares stays well conditioned.
+    ref = x[valid][0] if valid.any() else 0.0
+    d = np.where(valid, x - ref, 0.0)
+    csum = np.concatenate(([0.0], np.cumsum(d)))
+    csq = np.concatenate(([0.0], np.cumsum(d * d)))
+    count = np.concatenate(([0], np.cumsum(valid)))
+    full = (count[window:] - count[:-window]) == window
+    s = csum[window:] - csum[:-window]
+    var = (csq[window:] - csq[:-window] - s * s / window) / (window - 1)
+    var = np.where(_constant_windows(x, window), 0.0, np.maximum(var, 0.0))
+    out[window - 1 :] = np.where(full, np.sqrt(var), np.nan)
+    return out
+
+
 def calculate_technical_indicators(
     price_data: list, indicator: str, window: int = 14
 ) -> dict:
@@ -43,47 +324,40 @@ def calculate_technical_indicators(
         Dict with indicator values.
     """
     result = {}
-    if price_data and isinstance(price_data[0], dict):
-        closes = pd.Series([d["close"] for d in price_data])
-        highs = pd.Series([d.get("high", d["close"]) for d in price_data])
-        lows = pd.Series([d.get("low", d["close"]) for d in price_data])
-    else:
-        closes = pd.Series(price_data)
-        highs = closes
-        lows = closes
     try:
+        if price_data and isinstance(price_data[0], dict):
+            x = np.asarray([d["close"] for d in price_data], dtype=np.float64)
+            hi = np.asarray(
+                [d.get("high", d["close"]) for d in price_data], dtype=np.float64
+            )
+            lo = np.asarray(
+                [d.get("low", d["close"]) for d in price_data], dtype=np.float64
+            )
+        else:
+            x = np.asarray(price_data, dtype=np.float64)
+            hi = lo = x
+        if window < 1:
+            raise ValueError("window must be a positive integer")
         if indicator == "sma":
-            result["sma"] = closes.rolling(window=window).mean().tolist()
+            result["sma"] = _rolling_mean(x, window).tolist()
         elif indicator == "ema":
-            result["ema"] = closes.ewm(span=window, adjust=False).mean().tolist()
+            result["ema"] = _ema_njit(x, window).tolist()
         elif indicator == "rsi":
-            delta = closes.diff()
-            gain = delta.where(delta > 0, 0)
-            loss = -delta.where(delta < 0, 0)
-            alpha = 1.0 / window
-            avg_gain = gain.ewm(alpha=alpha, adjust=False).mean()
-            avg_loss = loss.ewm(alpha=alpha, adjust=False).mean()
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-            result["rsi"] = rsi.tolist()
+            result["rsi"] = _rsi_njit(x, window).tolist()
         elif indicator == "macd":
-            ema12 = closes.ewm(span=12, adjust=False).mean()
-            ema26 = closes.ewm(span=26, adjust=False).mean()
-            macd = ema12 - ema26
-            signal = macd.ewm(span=9, adjust=False).mean()
+            macd, signal = _macd_fused(x)
             result["macd"] = macd.tolist()
             result["macd_signal"] = signal.tolist()
         elif indicator == "volatility":
-            result["volatility"] = (
-                closes.pct_change().rolling(window=window).std().tolist()
-            )
+            result["volatility"] = _vol_njit(x, window).tolist()
         elif indicator == "bollinger_bands":
-            middle = closes.rolling(window=window).mean()
-            std = closes.rolling(window=window).std()
+            middle = _rolling_mean(x, window)
+            std = _rolling_std(x, window)
             result["upper"] = (middle + 2 * std).tolist()
             result["middle"] = middle.tolist()
             result["lower"] = (middle - 2 * std).tolist()
         elif indicator == "atr":
+            closes, highs, lows = pd.Series(x), pd.Series(hi), pd.Series(lo)
             prev_close = closes.shift(1)
             tr = pd.concat(
                 [
@@ -95,6 +369,7 @@ def calculate_technical_indicators(
             ).max(axis=1)
             result["atr"] = tr.ewm(alpha=1.0 / window, adjust=False).mean().tolist()
         elif indicator == "stochastic":
+            closes, highs, lows = pd.Series(x), pd.Series(hi), pd.Series(lo)
             lowest_low = lows.rolling(window=window).min()
             highest_high = highs.rolling(window=window).max()
             denom = highest_high - lowest_low
@@ -109,6 +384,32 @@ def calculate_technical_indicators(
     return result
 
 
+def detect_crossovers(
+    close: np.ndarray, short_window: int, long_window: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Moving-average crossover detection on a raw array of closing prices.
+    Args:
+        close: 1D float array of closing prices.
+        short_window: Short window for the short moving average.
+        long_window: Long window for the long moving average.
+    Returns:
+        Tuple of (short_ma, long_ma, signal) arrays, where signal is 1 on a
+        Golden Cross, -1 on a Death Cross and 0 otherwise.
+    """
+    short_ma = _rolling_mean(close, short_window)
+    long_ma = _rolling_mean(close, long_window)
+    # +1 when short moves above long from at-or-below, -1 when it moves below
+    # from at-or-above, computed branch-free as (rise) - (fall). Bars where the
+    # MAs are exactly equal, and NaN warm-up bars, compare false and stay 0.
+    sd = np.sign(short_ma - long_ma)
+    rise = (sd[1:] > 0) & (sd[:-1] <= 0)
+    fall = (sd[1:] < 0) & (sd[:-1] >= 0)
+    signal = np.zeros(close.shape[0], dtype=np.int8)
+    signal[1:] = rise.astype(np.int8) - fall.astype(np.int8)
+    return short_ma, long_ma, signal
+
+
 def calculate_trading_opportunities(
     prices: pd.DataFrame, short_window: int, long_window: int
 ) -> pd.DataFrame:
@@ -123,21 +424,11 @@ def calculate_trading_opportunities(
     Returns:
         pd.DataFrame with trading opportunities.
     """
-    prices["short_ma"] = prices["close"].rolling(window=short_window).mean()
-    prices["long_ma"] = prices["close"].rolling(window=long_window).mean()
-    prices["prev_short"] = prices["short_ma"].shift(1)
-    prices["prev_long"] = prices["long_ma"].shift(1)
-    prices["signal"] = 0
-    prices.loc[
-        (prices["short_ma"] > prices["long_ma"])
-        & (prices["prev_short"] <= prices["prev_long"]),
-        "signal",
-    ] = 1
-    prices.loc[
-        (prices["short_ma"] < prices["long_ma"])
-        & (prices["prev_short"] >= prices["prev_long"]),
-        "signal",
-    ] = -1
+    close = prices["close"].to_numpy(dtype=np.float64)
+    short_ma, long_ma, signal = detect_crossovers(close, short_window, long_window)
+    prices["short_ma"] = short_ma
+    prices["long_ma"] = long_ma
+    prices["signal"] = signal
     return prices
 
 
@@ -237,6 +528,101 @@ def backtest_strategy(
     }
 
 
+# Largest integer power a formula may produce, in bits. Without a cap an
+# expression like 9**9**9 passes the whitelist and ties up the server computing
+# a number with hundreds of millions of digits.
+_MAX_POW_BITS = 4096
+
+
+def _bounded_pow(base, exp):
+    if (
+        isinstance(base, int)
+        and isinstance(exp, int)
+        and exp > 0
+        and base not in (-1, 0, 1)
+        and base.bit_length() * exp > _MAX_POW_BITS
+    ):
+        raise ValueError("Exponent too large in formula")
+    return base**exp
+
+
+class _BoundPow(ast.NodeTransformer):
+    """Rewrites ``a ** b`` into a call to ``_bounded_pow(a, b)``."""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if not isinstance(node.op, ast.Pow):
+            return node
+        call = ast.Call(
+            func=ast.Name(id="_bounded_pow", ctx=ast.Load()),
+            args=[node.left, node.right],
+            keywords=[],
+        )
+        return ast.copy_location(call, node)
+
+
+_FORMULA_FUNCS = {"abs": abs, "min": min, "max": max}
+_FORMULA_GLOBALS = {
+    "__builtins__": None,
+    "_bounded_pow": _bounded_pow,
+    **_FORMULA_FUNCS,
+}
+_FORMULA_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.Compare,
+    ast.IfExp,
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.Call,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.UAdd,
+    ast.USub,
+    ast.Not,
+    ast.And,
+    ast.Or,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+)
+
+
+@functools.lru_cache(maxsize=512)
+def _compile_formula(formula: str):
+    """
+    Parses and compiles an arithmetic formula once. Only numbers, variable names,
+    arithmetic and comparison operators, ``x if cond else y`` and calls to
+    abs/min/max are allowed, and integer powers are capped at ``_MAX_POW_BITS``.
+    This limits what a formula can do; it is not a sandbox for untrusted data.
+    """
+    tree = ast.parse(formula, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _FORMULA_NODES):
+            raise ValueError(f"Unsupported syntax in formula: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported constant in formula: {node.value!r}")
+        if isinstance(node, ast.Call) and (
+            not isinstance(node.func, ast.Name)
+            or node.func.id not in _FORMULA_FUNCS
+            or node.keywords
+        ):
+            raise ValueError("Only abs, min and max may be called in a formula")
+    tree = ast.fix_missing_locations(_BoundPow().visit(tree))
+    return compile(tree, "<formula>", "eval")
+
+
 def custom_formula_evaluator(formula: str, data: dict) -> dict:
     """
     Evaluates a custom formula using variables from data dict.
@@ -247,22 +633,130 @@ def custom_formula_evaluator(formula: str, data: dict) -> dict:
         Dict with result or error.
     """
     try:
-        result = eval(formula, {"__builtins__": None}, data)
+        result = eval(_compile_formula(formula), _FORMULA_GLOBALS, data)
         return {"result": result}
     except Exception as e:
         return {"error": str(e)}
 
 
-def extract_value(financial_data: dict, key: str, preferred_sources: list) -> float:
+def extract_value(
+    financial_data: dict, key: str, preferred_sources: list | None = None
+) -> float:
     """
-    Extracts a value from a nested financial data dict.
+    Extracts a value from a nested financial data dict, looking in the
+    ``_METRIC_SOURCES`` sections for ``key`` unless ``preferred_sources`` is given.
     """
+    if preferred_sources is None:
+        preferred_sources = _METRIC_SOURCES[key]
     for src in preferred_sources:
-        if src in financial_data and key in financial_data[src]:
-            return financial_data[src][key]
+        section = financial_data.get(src)
+        if isinstance(section, dict) and key in section:
+            return section[key]
     return None
 
 
+# Statement sections to look each input up in, in priority order.
+_METRIC_SOURCES = {
+    "revenue": ("income_statement",),
+    "cost_of_goods_sold": ("income_statement",),
+    "operating_income": ("income_statement",),
+    "net_income": ("income_statement",),
+    "ebitda": ("income_statement",),
+    "depreciation": ("income_statement", "cash_flow"),
+    "amortization": ("income_statement", "cash_flow"),
+    "total_liabilities": ("balance_sheet",),
+    "shareholders_equity": ("balance_sheet",),
+    "current_assets": ("balance_sheet",),
+    "current_liabilities": ("balance_sheet",),
+    "inventory": ("balance_sheet",),
+    "shares_outstanding": ("market", "income_statement"),
+    "operating_cash_flow": ("cash_flow",),
+    "capital_expenditures": ("cash_flow",),
+    "total_assets": ("balance_sheet",),
+    "price": ("market",),
+    "dividends_per_share": ("income_statement", "market"),
+}
+
+
+def _flatten_financial_data(financial_data: dict) -> dict:
+    """
+    Resolves every metric input from the nested statement sections in one pass,
+    honouring the source priority in ``_METRIC_SOURCES``.
+    """
+    return {
+        key: extract_value(financial_data, key, sources)
+        for key, sources in _METRIC_SOURCES.items()
+    }
+
+
+def _safe_div(num, denom):
+    return num / denom if num is not None and denom not in (None, 0) else None
+
+
+# The metric parts below take a ``get(key)`` callable for their inputs, so a
+# single metric looks up only the inputs it uses while a batch of metrics can
+# read them all from one flattened dict.
+def _field(key: str):
+    return lambda get: get(key)
+
+
+def _difference(a: str, b: str):
+    def diff(get):
+        x, y = get(a), get(b)
+        return x - y if x is not None and y is not None else None
+
+    return diff
+
+
+def _ebitda(get):
+    ebitda = get("ebitda")
+    if ebitda is not None:
+        return ebitda
+    parts = (get("operating_income"), get("depreciation"), get("amortization"))
+    return sum(parts) if None not in parts else None
+
+
+def _eps(get):
+    return _safe_div(get("net_income"), get("shares_outstanding"))
+
+
+def _book_value_per_share(get):
+    return _safe_div(get("shareholders_equity"), get("shares_outstanding"))
+
+
+# indicator -> (numerator, denominator) over the metric inputs; a None
+# denominator means the numerator is the metric itself.
+_METRICS = {
+    "gross_margin": (
+        _difference("revenue", "cost_of_goods_sold"),
+        _field("revenue"),
+    ),
+    "operating_margin": (_field("operating_income"), _field("revenue")),
+    "net_profit_margin": (_field("net_income"), _field("revenue")),
+    "ebitda": (_ebitda, None),
+    "debt_to_equity": (_field("total_liabilities"), _field("shareholders_equity")),
+    "current_ratio": (_field("current_assets"), _field("current_liabilities")),
+    "quick_ratio": (
+        _difference("current_assets", "inventory"),
+        _field("current_liabilities"),
+    ),
+    "book_value_per_share": (
+        _field("shareholders_equity"),
+        _field("shares_outstanding"),
+    ),
+    "free_cash_flow": (
+        _difference("operating_cash_flow", "capital_expenditures"),
+        None,
+    ),
+    "cash_flow_margin": (_field("operating_cash_flow"), _field("revenue")),
+    "roe": (_field("net_income"), _field("shareholders_equity")),
+    "roa": (_field("net_income"), _field("total_assets")),
+    "pe_ratio": (_field("price"), _eps),
+    "pb_ratio": (_field("price"), _book_value_per_share),
+    "dividend_yield": (_field("dividends_per_share"), _field("price")),
+}
+
+
 def calculate_financial_metric(financial_data: dict, indicator: str) -> dict:
     """
     Calculates a specified financial metric from the provided data. The metrics are:
@@ -288,139 +782,36 @@ def calculate_financial_metric(financial_data: dict, indicator: str) -> dict:
         Dict with keys: 'indicator', 'value', and optionally 'error'.
     """
 
-    # Helper for safe division
-    def safe_div(num, denom):
-        return num / denom if num is not None and denom not in (None, 0) else None
-
-    # Metric calculation logic
-    if indicator == "gross_margin":
-        revenue = extract_value(financial_data, "revenue", ["income_statement"])
-        cogs = extract_value(financial_data, "cost_of_goods_sold", ["income_statement"])
-        value = (
-            safe_div(revenue - cogs, revenue)
-            if revenue is not None and cogs is not None
-            else None
-        )
-    elif indicator == "operating_margin":
-        revenue = extract_value(financial_data, "revenue", ["income_statement"])
-        operating_income = extract_value(
-            financial_data, "operating_income", ["income_statement"]
-        )
-        value = safe_div(operating_income, revenue)
-    elif indicator == "net_profit_margin":
-        revenue = extract_value(financial_data, "revenue", ["income_statement"])
-        net_income = extract_value(financial_data, "net_income", ["income_statement"])
-        value = safe_div(net_income, revenue)
-    elif indicator == "ebitda":
-        ebitda = extract_value(financial_data, "ebitda", ["income_statement"])
-        if ebitda is not None:
-            value = ebitda
-        else:
-            operating_income = extract_value(
-                financial_data, "operating_income", ["income_statement"]
-            )
-            depreciation = extract_value(
-                financial_data, "depreciation", ["income_statement", "cash_flow"]
-            )
-            amortization = extract_value(
-                financial_data, "amortization", ["income_statement", "cash_flow"]
-            )
-            value = (
-                operating_income + depreciation + amortization
-                if None not in (operating_income, depreciation, amortization)
-                else None
-            )
-    elif indicator == "debt_to_equity":
-        total_liabilities = extract_value(
-            financial_data, "total_liabilities", ["balance_sheet"]
-        )
-        shareholders_equity = extract_value(
-            financial_data, "shareholders_equity", ["balance_sheet"]
-        )
-        value = safe_div(total_liabilities, shareholders_equity)
-    elif indicator == "current_ratio":
-        current_assets = extract_value(
-            financial_data, "current_assets", ["balance_sheet"]
-        )
-        current_liabilities = extract_value(
-            financial_data, "current_liabilities", ["balance_sheet"]
-        )
-        value = safe_div(current_assets, current_liabilities)
-    elif indicator == "quick_ratio":
-        current_assets = extract_value(
-            financial_data, "current_assets", ["balance_sheet"]
-        )
-        inventory = extract_value(financial_data, "inventory", ["balance_sheet"])
-        current_liabilities = extract_value(
-            financial_data, "current_liabilities", ["balance_sheet"]
-        )
-        value = (
-            safe_div(current_assets - inventory, current_liabilities)
-            if None not in (current_assets, inventory, current_liabilities)
-            else None
-        )
-    elif indicator == "book_value_per_share":
-        shareholders_equity = extract_value(
-            financial_data, "shareholders_equity", ["balance_sheet"]
-        )
-        shares_outstanding = extract_value(
-            financial_data, "shares_outstanding", ["market", "income_statement"]
-        )
-        value = safe_div(shareholders_equity, shares_outstanding)
-    elif indicator == "free_cash_flow":
-        operating_cash_flow = extract_value(
-            financial_data, "operating_cash_flow", ["cash_flow"]
-        )
-        capex = extract_value(financial_data, "capital_expenditures", ["cash_flow"])
-        value = (
-            operating_cash_flow - capex
-            if None not in (operating_cash_flow, capex)
-            else None
-        )
-    elif indicator == "cash_flow_margin":
-        operating_cash_flow = extract_value(
-            financial_data, "operating_cash_flow", ["cash_flow"]
-        )
-        revenue = extract_value(financial_data, "revenue", ["income_statement"])
-        value = safe_div(operating_cash_flow, revenue)
-    elif indicator == "roe":
-        net_income = extract_value(financial_data, "net_income", ["income_statement"])
-        shareholders_equity = extract_value(
-            financial_data, "shareholders_equity", ["balance_sheet"]
-        )
-        value = safe_div(net_income, shareholders_equity)
-    elif indicator == "roa":
-        net_income = extract_value(financial_data, "net_income", ["income_statement"])
-        total_assets = extract_value(financial_data, "total_assets", ["balance_sheet"])
-        value = safe_div(net_income, total_assets)
-    elif indicator == "pe_ratio":
-        price = extract_value(financial_data, "price", ["market"])
-        net_income = extract_value(financial_data, "net_income", ["income_statement"])
-        shares_outstanding = extract_value(
-            financial_data, "shares_outstanding", ["market", "income_statement"]
-        )
-        eps = safe_div(net_income, shares_outstanding)
-        value = safe_div(price, eps) if eps not in (None, 0) else None
-    elif indicator == "pb_ratio":
-        price = extract_value(financial_data, "price", ["market"])
-        shareholders_equity = extract_value(
-            financial_data, "shareholders_equity", ["balance_sheet"]
-        )
-        shares_outstanding = extract_value(
-            financial_data, "shares_outstanding", ["market", "income_statement"]
-        )
-        book_value_per_share = safe_div(shareholders_equity, shares_outstanding)
-        value = (
-            safe_div(price, book_value_per_share)
-            if book_value_per_share not in (None, 0)
-            else None
-        )
-    elif indicator == "dividend_yield":
-        dividends_per_share = extract_value(
-            financial_data, "dividends_per_share", ["income_statement", "market"]
-        )
-        price = extract_value(financial_data, "price", ["market"])
-        value = safe_div(dividends_per_share, price)
-    else:
+    spec = _METRICS.get(indicator)
+    if spec is None:
         return {"indicator": indicator, "value": None, "error": "Unknown indicator"}
-    return {"indicator": indicator, "value": value}
+    get = functools.partial(extract_value, financial_data)
+    return {"indicator": indicator, "value": _compute_metric(spec, get)}
+
+
+def _compute_metric(spec: tuple, get):
+    numerator, denominator = spec
+    value = numerator(get)
+    if denominator is not None:
+        value = _safe_div(value, denominator(get))
+    return value
+
+
+def calculate_all_financial_metrics(financial_data: dict) -> dict:
+    """
+    Calculates every supported financial metric in one call, resolving the inputs
+    from the nested sections once and sharing them across metrics.
+    Args:
+        financial_data: dict (flat or nested)
+    Returns:
+        Dict mapping each metric name to its value, or None when it cannot be computed.
+    """
+    get = _flatten_financial_data(financial_data).__getitem__
+    result = {}
+    for name, spec in _METRICS.items():
+        try:
+            result[name] = _compute_metric(spec, get)
+        except (TypeError, ArithmeticError):
+            # A non-numeric input (e.g. "N/A") only invalidates the metrics that use it
+            result[name] = None
+    return result
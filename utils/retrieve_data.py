@@ -1,24 +1,80 @@
-import yfinance as yf
+# yfinance is imported inside each function so that loading this module (and
+# starting the server) does not pay for it up front.
+import pandas as pd
+
+from utils._cache import ttl_cache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Quotes go stale quickly; fundamentals, dividends and splits change at most daily.
+_PRICE_TTL = 60
+_FUNDAMENTALS_TTL = 24 * 60 * 60
+
+# Currency per ticker, as learned from get_ticker_info. Lets get_current_price
+# report it without an extra (slow) Ticker.info request of its own.
+_CURRENCIES: dict[str, str] = {}
+
+
+def _json_key(key):
+    # pandas' to_json writes timestamps as epoch milliseconds
+    return key.value // 1_000_000 if isinstance(key, pd.Timestamp) else key
+
+
+def _to_json(obj: pd.Series | pd.DataFrame) -> str:
+    """
+    Serializes a Series or DataFrame with the same layout as ``obj.to_json()``,
+    using orjson's C encoder when it is installed.
+    """
+    if orjson is None:
+        return obj.to_json()
+    if isinstance(obj, pd.Series):
+        data = {_json_key(k): v for k, v in obj.items()}
+    else:
+        data = {
+            _json_key(col): {_json_key(k): v for k, v in obj[col].items()}
+            for col in obj.columns
+        }
+    return orjson.dumps(
+        data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    ).decode()
 
 
 # market data tools
-def get_current_price(ticker: str) -> dict:
+@ttl_cache(ttl=_PRICE_TTL)
+def _latest_close(ticker: str) -> tuple[float, str] | None:
     """
-    Fetches the latest price for the given ticker.
+    Fetches the last close and its timestamp for the given ticker, or None if
+    yfinance has no data for it.
     """
+    import yfinance as yf
+
     stock = yf.Ticker(ticker)
     data = stock.history(period="1d")
-    if not data.empty:
-        price = data["Close"].iloc[-1]
-        timestamp = data.index[-1].to_pydatetime().isoformat()
-        return {
-            "ticker": ticker,
-            "price": float(price),
-            "currency": stock.info.get("currency", "USD"),
-            "timestamp": timestamp,
-        }
-    else:
+    if data.empty:
+        return None
+    return float(data["Close"].iloc[-1]), data.index[-1].to_pydatetime().isoformat()
+
+
+def get_current_price(ticker: str) -> dict:
+    """
+    Fetches the latest price for the given ticker. The currency comes from an
+    earlier get_ticker_info call for the same ticker and defaults to USD.
+    """
+    latest = _latest_close(ticker)
+    if latest is None:
         return {"error": f"No data found for ticker {ticker}"}
+    price, timestamp = latest
+    # Looked up on every call, outside the cache, so a currency learned after
+    # the price was cached is still reported.
+    return {
+        "ticker": ticker,
+        "price": price,
+        "currency": _CURRENCIES.get(ticker.upper(), "USD"),
+        "timestamp": timestamp,
+    }
 
 
 def fetch_stock_data(ticker_list, start_date, end_date, interval="1d"):
@@ -31,50 +87,89 @@ def fetch_stock_data(ticker_list, start_date, end_date, interval="1d"):
         interval: Data interval (e.g., '1d', '1h', '5m', etc.)
     Returns:
         Dict mapping ticker to its historical data in columnar format (dict of lists), e.g. {'date': [...], 'open': [...], ...}.
+        Bar times are exchange-local wall times without a UTC offset, as strings:
+        'date' like '2024-01-02' for daily and longer intervals, 'datetime' like
+        '2024-01-02 09:30:00' for intraday ones.
     """
+    import yfinance as yf
+
     result = {}
+    if not ticker_list:
+        return result
+    # One batched request for all tickers; yfinance fetches them on its own
+    # thread pool and returns (ticker, field) columns.
+    data = yf.download(
+        list(ticker_list),
+        start=start_date,
+        end=end_date,
+        interval=interval,
+        group_by="ticker",
+        auto_adjust=True,
+        actions=True,
+        threads=True,
+        # Keep each exchange's local wall time and drop the offset, so tickers
+        # from different time zones line up on the same dates.
+        ignore_tz=True,
+        progress=False,
+    )
+    downloaded = set(data.columns.get_level_values(0)) if data is not None else set()
     for ticker in ticker_list:
-        data = yf.Ticker(ticker).history(
-            start=start_date, end=end_date, interval=interval
-        )
-        if not data.empty:
-            data = data.reset_index()
+        if ticker.upper() not in downloaded:
+            result[ticker] = {}
+            continue
+        # Tickers are aligned on a shared index, so drop dates this one lacks.
+        frame = data[ticker.upper()].dropna(how="all")
+        if not frame.empty:
+            frame = frame.reset_index()
             # Convert all columns to lower case
-            data.columns = [str(col).lower() for col in data.columns]
-            # Convert 'date' column to string for JSON serialization
-            if "date" in data.columns:
-                data["date"] = data["date"].astype(str)
+            frame.columns = [str(col).lower() for col in frame.columns]
+            # Convert the 'date' (or intraday 'datetime') column to string for
+            # JSON serialization
+            for col in ("date", "datetime"):
+                if col in frame.columns:
+                    frame[col] = frame[col].astype(str)
             # Convert to dict of lists (columnar format)
-            result[ticker] = {col: data[col].tolist() for col in data.columns}
+            result[ticker] = {col: frame[col].tolist() for col in frame.columns}
         else:
             result[ticker] = {}
     return result
 
 
+@ttl_cache(ttl=_FUNDAMENTALS_TTL)
 def get_dividends(ticker: str) -> str:
     """
     Fetches dividends for the given ticker.
     """
+    import yfinance as yf
+
     stock = yf.Ticker(ticker)
     dividends = stock.dividends
-    return dividends.to_json()
+    return _to_json(dividends)
 
 
+@ttl_cache(ttl=_FUNDAMENTALS_TTL)
 def get_splits(ticker: str) -> str:
     """
     Fetches splits for the given ticker.
     """
+    import yfinance as yf
+
     stock = yf.Ticker(ticker)
     splits = stock.splits
-    return splits.to_json()
+    return _to_json(splits)
 
 
+@ttl_cache(ttl=_FUNDAMENTALS_TTL)
 def get_ticker_info(ticker: str) -> dict:
     """
     Fetches basic info about the ticker (name, sector, etc.)
     """
+    import yfinance as yf
+
     stock = yf.Ticker(ticker)
     info = stock.info
+    if info.get("currency"):
+        _CURRENCIES[ticker.upper()] = info["currency"]
     return {
         "ticker": ticker,
         "name": info.get("shortName", ""),
@@ -86,19 +181,22 @@ def get_ticker_info(ticker: str) -> dict:
 
 
 # financial statements extraction tools
+@ttl_cache(ttl=_FUNDAMENTALS_TTL)
 def get_financial_statements(ticker: str, indicator: str) -> str:
     """
     Fetches the annual income statements, balance sheet, and cash flow for the given ticker.
     """
+    import yfinance as yf
+
     stock = yf.Ticker(ticker)
     if indicator == "income_statement":
         statements = stock.financials
-        return {"income_statement": statements.to_json()}
+        return {"income_statement": _to_json(statements)}
     elif indicator == "balance_sheet":
         statements = stock.balance_sheet
-        return {"balance_sheet": statements.to_json()}
+        return {"balance_sheet": _to_json(statements)}
     elif indicator == "cash_flow":
         statements = stock.cashflow
-        return {"cash_flow": statements.to_json()}
+        return {"cash_flow": _to_json(statements)}
     else:
         return {"error": f"Invalid indicator: {indicator}"}
@@ -1,18 +1,47 @@
+import multiprocessing
 import os
 import platform
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from mcp.server.fastmcp import Image
 
-from utils.calculate_metrics import calculate_trading_opportunities
+from utils.calculate_metrics import detect_crossovers
 
-_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+# Matplotlib and Pillow are imported on first use so they do not slow down
+# server start-up for clients that never plot.
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# Resolved and created once at import, so saving a chart is a single write.
+_DATA_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+)
 os.makedirs(_DATA_DIR, exist_ok=True)
 
+# Charts are only ever rendered to PNG, so a single pyplot-free Figure (drawn
+# by the Agg canvas) is reused across calls instead of building a new one.
+_FIG: "Figure | None" = None
+
+# Worker pool for plot_batch, created on first use and reused afterwards.
+_POOL: ProcessPoolExecutor | None = None
+
+
+def _get_axes():
+    """Return the shared figure, cleared, with a fresh set of axes."""
+    global _FIG
+    if _FIG is None:
+        from matplotlib.figure import Figure
+
+        _FIG = Figure(figsize=(10, 5))
+    _FIG.clear()
+    return _FIG, _FIG.add_subplot()
+
 
 def _open_file(filepath: str) -> None:
     """Open a file with the system's default application."""
@@ -25,12 +54,40 @@ def _open_file(filepath: str) -> None:
         os.startfile(filepath)
 
 
-def _save_and_return(buf: BytesIO, filename: str) -> Image:
-    img_bytes = buf.read()
+def _column(prices, key: str) -> list:
+    """Pull one field out of OHLCV data given as a list of dicts or a dict of lists."""
+    if isinstance(prices, dict):
+        return prices[key]
+    return [row[key] for row in prices]
+
+
+def _render_png(fig: "Figure") -> bytes:
+    """
+    Render the figure to a palette PNG. Charts use few distinct colours, so a
+    256-colour adaptive palette is visually lossless and less than half the size
+    of Matplotlib's RGBA output.
+    """
+    from PIL import Image as PILImage
+
+    raw = BytesIO()
+    # Store the intermediate uncompressed; it is decoded again straight away.
+    fig.savefig(
+        raw, format="png", bbox_inches="tight", pil_kwargs={"compress_level": 0}
+    )
+    img = PILImage.open(raw).convert("RGB").quantize(256)
+    out = BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _save_and_return(
+    img_bytes: bytes, filename: str, return_image: bool = True
+) -> Image | dict:
     filepath = os.path.join(_DATA_DIR, filename)
-    with open(filepath, "wb") as f:
-        f.write(img_bytes)
+    Path(filepath).write_bytes(img_bytes)
     _open_file(filepath)
+    if not return_image:
+        return {"file_path": filepath}
     return Image(data=img_bytes, format="png")
 
 
@@ -39,23 +96,32 @@ def plot_price_chart(
     chart_type: str = "line",
     title: str = "Price Chart",
     filename: str | None = None,
-) -> Image:
+    return_image: bool = True,
+) -> Image | dict:
+    import matplotlib.dates as mdates
     from matplotlib.ticker import MaxNLocator
 
-    df = pd.DataFrame(prices)
-    df["date"] = pd.to_datetime(df["date"])
-    fig, ax = plt.subplots(figsize=(10, 5))
+    dates = pd.to_datetime(_column(prices, "date"))
+    close = np.asarray(_column(prices, "close"), dtype=np.float64)
+    fig, ax = _get_axes()
     if chart_type == "line":
-        ax.plot(df["date"], df["close"], label="Close Price")
+        ax.plot(dates, close, label="Close Price")
         ax.set_ylabel("Close Price")
     elif chart_type == "candlestick":
         try:
             from mplfinance.original_flavor import candlestick_ohlc
         except ImportError:
             raise ImportError("mplfinance is required for candlestick charts")
-        df_ohlc = df[["date", "open", "high", "low", "close"]].copy()
-        df_ohlc["date"] = mdates.date2num(df_ohlc["date"])
-        candlestick_ohlc(ax, df_ohlc.values, width=0.6, colorup="g", colordown="r")
+        ohlc = np.column_stack(
+            [
+                mdates.date2num(dates),
+                np.asarray(_column(prices, "open"), dtype=np.float64),
+                np.asarray(_column(prices, "high"), dtype=np.float64),
+                np.asarray(_column(prices, "low"), dtype=np.float64),
+                close,
+            ]
+        )
+        candlestick_ohlc(ax, ohlc, width=0.6, colorup="g", colordown="r")
         ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
         ax.set_ylabel("Price")
     else:
@@ -64,11 +130,9 @@ def plot_price_chart(
     ax.xaxis.set_major_locator(MaxNLocator(integer=True))
     ax.grid(True)
     fig.autofmt_xdate()
-    buf = BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return _save_and_return(buf, filename or f"price_chart_{chart_type}.png")
+    return _save_and_return(
+        _render_png(fig), filename or f"price_chart_{chart_type}.png", return_image
+    )
 
 
 def plot_financial_metric(
@@ -77,8 +141,9 @@ def plot_financial_metric(
     metric_name: str = "Metric",
     title: str = "Financial Metric",
     filename: str | None = None,
-) -> Image:
-    fig, ax = plt.subplots(figsize=(10, 5))
+    return_image: bool = True,
+) -> Image | dict:
+    fig, ax = _get_axes()
     parsed_dates = pd.to_datetime(dates)
     ax.plot(parsed_dates, values, marker="o", label=metric_name)
     ax.set_title(title)
@@ -87,11 +152,11 @@ def plot_financial_metric(
     ax.legend()
     ax.grid(True)
     fig.autofmt_xdate()
-    buf = BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return _save_and_return(buf, filename or f"financial_metric_{metric_name}.png")
+    return _save_and_return(
+        _render_png(fig),
+        filename or f"financial_metric_{metric_name}.png",
+        return_image,
+    )
 
 
 def plot_comparison_chart(
@@ -100,8 +165,9 @@ def plot_comparison_chart(
     title: str = "Comparison Chart",
     filename: str | None = None,
     normalized: bool = False,
-) -> Image:
-    fig, ax = plt.subplots(figsize=(10, 5))
+    return_image: bool = True,
+) -> Image | dict:
+    fig, ax = _get_axes()
     parsed_dates = pd.to_datetime(dates)
     for label, values in series.items():
         if normalized:
@@ -119,11 +185,9 @@ def plot_comparison_chart(
     ax.legend()
     ax.grid(True)
     fig.autofmt_xdate()
-    buf = BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return _save_and_return(buf, filename or "comparison_chart.png")
+    return _save_and_return(
+        _render_png(fig), filename or "comparison_chart.png", return_image
+    )
 
 
 def plot_trading_opportunities(
@@ -131,46 +195,32 @@ def plot_trading_opportunities(
     short_window: int = 9,
     long_window: int = 21,
     title: str = "Trading Opportunities",
-) -> Image:
-    prices_df = pd.DataFrame(prices)
-    prices_df["date"] = pd.to_datetime(prices_df["date"])
-    prices_df = calculate_trading_opportunities(prices_df, short_window, long_window)
-    buy_signals = prices_df[prices_df["signal"] == 1]
-    sell_signals = prices_df[prices_df["signal"] == -1]
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.plot(
-        prices_df["date"],
-        prices_df["close"],
-        label="Close Price",
-        color="blue",
-        alpha=0.5,
-    )
-    ax.plot(
-        prices_df["date"],
-        prices_df["short_ma"],
-        label=f"Short MA ({short_window})",
-        color="orange",
-    )
-    ax.plot(
-        prices_df["date"],
-        prices_df["long_ma"],
-        label=f"Long MA ({long_window})",
-        color="magenta",
-    )
-    if not buy_signals.empty:
-        plt.scatter(
-            buy_signals["date"],
-            buy_signals["close"],
+    filename: str | None = None,
+    return_image: bool = True,
+) -> Image | dict:
+    dates = pd.to_datetime(_column(prices, "date"))
+    close = np.asarray(_column(prices, "close"), dtype=np.float64)
+    short_ma, long_ma, signal = detect_crossovers(close, short_window, long_window)
+    buy = np.flatnonzero(signal == 1)
+    sell = np.flatnonzero(signal == -1)
+    fig, ax = _get_axes()
+    ax.plot(dates, close, label="Close Price", color="blue", alpha=0.5)
+    ax.plot(dates, short_ma, label=f"Short MA ({short_window})", color="orange")
+    ax.plot(dates, long_ma, label=f"Long MA ({long_window})", color="magenta")
+    if buy.size:
+        ax.scatter(
+            dates[buy],
+            close[buy],
             marker="^",
             color="green",
             label="Buy Signal",
             s=100,
             zorder=5,
         )
-    if not sell_signals.empty:
-        plt.scatter(
-            sell_signals["date"],
-            sell_signals["close"],
+    if sell.size:
+        ax.scatter(
+            dates[sell],
+            close[sell],
             marker="v",
             color="red",
             label="Sell Signal",
@@ -183,8 +233,40 @@ def plot_trading_opportunities(
     ax.legend()
     ax.grid(True)
     fig.autofmt_xdate()
-    buf = BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return _save_and_return(buf, "trading_opportunities.png")
+    return _save_and_return(
+        _render_png(fig), filename or "trading_opportunities.png", return_image
+    )
+
+
+_PLOTTERS = {
+    "price_chart": plot_price_chart,
+    "financial_metric": plot_financial_metric,
+    "comparison_chart": plot_comparison_chart,
+    "trading_opportunities": plot_trading_opportunities,
+}
+
+
+def _run_plot_job(job: dict) -> Image | dict:
+    kwargs = dict(job)
+    return _PLOTTERS[kwargs.pop("type")](**kwargs)
+
+
+def plot_batch(jobs: list) -> list:
+    """
+    Renders several charts in parallel, one worker process per job.
+    Args:
+        jobs: List of dicts, each with a 'type' key (one of _PLOTTERS) plus the
+              keyword arguments of the matching plot_* function.
+    Returns:
+        List of plot results (Image or {"file_path": ...}) in the order of jobs.
+    """
+    global _POOL
+    for job in jobs:
+        if job.get("type") not in _PLOTTERS:
+            raise ValueError(f"Unknown plot type: {job.get('type')}")
+    if len(jobs) <= 1:
+        return [_run_plot_job(job) for job in jobs]
+    if _POOL is None:
+        # spawn rather than fork: the server process is multi-threaded.
+        _POOL = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    return list(_POOL.map(_run_plot_job, jobs))